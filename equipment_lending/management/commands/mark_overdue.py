@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from equipment_lending.models import BorrowRequest
+
+
+class Command(BaseCommand):
+    help = ("Mark issued requests past their return date as overdue. "
+            "Run periodically (e.g. every few minutes from cron).")
+
+    def handle(self, *args, **options):
+        updated = BorrowRequest.objects.filter(
+            status='issued',
+            borrow_until__lt=timezone.now()
+        ).update(status='overdue')
+        self.stdout.write(self.style.SUCCESS(f"Marked {updated} request(s) as overdue"))
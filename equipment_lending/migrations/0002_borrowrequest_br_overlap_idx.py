@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-15 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("equipment_lending", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="borrowrequest",
+            index=models.Index(
+                condition=models.Q(("status__in", ["approved", "issued"])),
+                fields=["equipment", "borrow_from", "borrow_until"],
+                name="br_overlap_idx",
+            ),
+        ),
+    ]
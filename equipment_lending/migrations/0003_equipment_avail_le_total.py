@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-15 10:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("equipment_lending", "0002_borrowrequest_br_overlap_idx"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="equipment",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    ("available_quantity__lte", models.F("total_quantity")),
+                    ("available_quantity__gte", 0),
+                ),
+                name="avail_le_total",
+            ),
+        ),
+    ]
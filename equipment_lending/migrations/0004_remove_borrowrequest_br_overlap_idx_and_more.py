@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-15 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("equipment_lending", "0003_equipment_avail_le_total"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="borrowrequest",
+            name="br_overlap_idx",
+        ),
+        migrations.AddIndex(
+            model_name="borrowrequest",
+            index=models.Index(
+                condition=models.Q(("status__in", ("approved", "issued", "overdue"))),
+                fields=["equipment", "borrow_from", "borrow_until"],
+                name="br_overlap_idx",
+            ),
+        ),
+    ]
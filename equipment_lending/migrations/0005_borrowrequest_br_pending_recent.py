@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-15 14:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("equipment_lending", "0004_remove_borrowrequest_br_overlap_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="borrowrequest",
+            index=models.Index(
+                condition=models.Q(("status", "pending")),
+                fields=["-requested_date"],
+                name="br_pending_recent",
+            ),
+        ),
+    ]
@@ -1,8 +1,12 @@
 from django.db import models
+from django.db.models import F, Q, Sum
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 
+# Statuses during which borrowed units are committed and unavailable to others
+ACTIVE_STATUSES = ('approved', 'issued', 'overdue')
+
 
 class User(AbstractUser):
     """Extended user model with roles"""
@@ -67,6 +71,12 @@ class Equipment(models.Model):
             models.Index(fields=['category', 'is_active']),
             models.Index(fields=['available_quantity']),
         ]
+        constraints = [
+            models.CheckConstraint(
+                check=Q(available_quantity__lte=F('total_quantity')) & Q(available_quantity__gte=0),
+                name='avail_le_total'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.available_quantity}/{self.total_quantity})"
@@ -75,11 +85,6 @@ class Equipment(models.Model):
     def is_available(self):
         return self.available_quantity > 0 and self.is_active
 
-    def save(self, *args, **kwargs):
-        if self.available_quantity > self.total_quantity:
-            self.available_quantity = self.total_quantity
-        super().save(*args, **kwargs)
-
 
 class BorrowRequest(models.Model):
     """Borrowing requests made by users"""
@@ -120,6 +125,10 @@ class BorrowRequest(models.Model):
             models.Index(fields=['status', 'user']),
             models.Index(fields=['equipment', 'status']),
             models.Index(fields=['borrow_from', 'borrow_until']),
+            models.Index(fields=['equipment', 'borrow_from', 'borrow_until'], name='br_overlap_idx',
+                         condition=Q(status__in=ACTIVE_STATUSES)),
+            models.Index(fields=['-requested_date'], name='br_pending_recent',
+                         condition=Q(status='pending')),
         ]
 
     def __str__(self):
@@ -136,15 +145,17 @@ class BorrowRequest(models.Model):
         """Check if equipment is available for the requested period"""
         overlapping = BorrowRequest.objects.filter(
             equipment=self.equipment,
-            status__in=['approved', 'issued'],
+            status__in=ACTIVE_STATUSES,
             borrow_from__lt=self.borrow_until,
             borrow_until__gt=self.borrow_from
         ).exclude(pk=self.pk)
 
-        borrowed_quantity = sum(req.quantity for req in overlapping)
+        borrowed_quantity = overlapping.aggregate(total=Sum('quantity'))['total'] or 0
         available = self.equipment.total_quantity - borrowed_quantity
         return available >= self.quantity
 
     @property
     def is_overdue(self):
+        if self.status == 'overdue':
+            return True
         return self.status == 'issued' and timezone.now() > self.borrow_until
@@ -1,9 +1,21 @@
 from rest_framework import permissions
 
+PRIVILEGED_ROLES = ('admin', 'staff')
+
+
+def is_privileged(request):
+    """Whether the requesting user is admin or staff, computed once per request"""
+    try:
+        return request._is_privileged
+    except AttributeError:
+        request._is_privileged = (request.user.is_authenticated
+                                  and request.user.role in PRIVILEGED_ROLES)
+        return request._is_privileged
+
 
 class IsAdminOrStaff(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.is_authenticated and request.user.role in ['admin', 'staff']
+        return is_privileged(request)
 
 
 class IsAdmin(permissions.BasePermission):
@@ -13,6 +25,6 @@ class IsAdmin(permissions.BasePermission):
 
 class IsOwnerOrStaff(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        if request.user.role in ['admin', 'staff']:
+        if is_privileged(request):
             return True
-        return obj.user == request.user
\ No newline at end of file
+        return obj.user_id == request.user.pk
@@ -27,7 +27,7 @@ class UserSerializer(serializers.ModelSerializer):
 
 
 class EquipmentCategorySerializer(serializers.ModelSerializer):
-    equipment_count = serializers.IntegerField(source='equipment.count', read_only=True)
+    equipment_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = EquipmentCategory
@@ -50,6 +50,12 @@ class EquipmentSerializer(serializers.ModelSerializer):
         validated_data['available_quantity'] = validated_data['total_quantity']
         return super().create(validated_data)
 
+    def update(self, instance, validated_data):
+        total_quantity = validated_data.get('total_quantity', instance.total_quantity)
+        if instance.available_quantity > total_quantity:
+            validated_data['available_quantity'] = total_quantity
+        return super().update(instance, validated_data)
+
 
 class BorrowRequestSerializer(serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
@@ -92,4 +98,35 @@ class BorrowRequestSerializer(serializers.ModelSerializer):
             )
 
         request.save()
-        return request
\ No newline at end of file
+        return request
+
+
+class BorrowRequestReadSerializer(serializers.BaseSerializer):
+    """Read-only BorrowRequest output without DRF's per-field source traversal"""
+
+    def to_representation(self, instance):
+        approved_by = instance.approved_by
+        is_overdue = getattr(instance, 'is_overdue_sql', None)
+        if is_overdue is None:
+            is_overdue = instance.is_overdue
+        return {
+            'id': instance.id,
+            'user': instance.user_id,
+            'user_name': instance.user.get_full_name(),
+            'equipment': instance.equipment_id,
+            'equipment_name': instance.equipment.name,
+            'quantity': instance.quantity,
+            'purpose': instance.purpose,
+            'status': instance.status,
+            'requested_date': instance.requested_date,
+            'borrow_from': instance.borrow_from,
+            'borrow_until': instance.borrow_until,
+            'approved_by': instance.approved_by_id,
+            'approved_by_name': approved_by.get_full_name() if approved_by else None,
+            'approved_date': instance.approved_date,
+            'issued_date': instance.issued_date,
+            'returned_date': instance.returned_date,
+            'rejection_reason': instance.rejection_reason,
+            'notes': instance.notes,
+            'is_overdue': is_overdue,
+        }
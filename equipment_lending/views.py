@@ -1,15 +1,61 @@
+from datetime import datetime, time
+from functools import lru_cache
+from time import time_ns
+
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
+from django.core.cache import cache
 from django.utils import timezone
-from django.db.models import Q
-from .models import Equipment, EquipmentCategory, BorrowRequest
+from django.utils.dateparse import parse_date, parse_datetime
+from django.db import transaction
+from django.db.models import (BooleanField, Case, CharField, Count, F, OuterRef, Q, Subquery,
+                              Sum, Value, When)
+from django.db.models.functions import Coalesce, Concat, Least, Now, Trim
+from .models import ACTIVE_STATUSES, Equipment, EquipmentCategory, BorrowRequest
 from .serializers import (EquipmentSerializer, EquipmentCategorySerializer,
-                          BorrowRequestSerializer, UserRegistrationSerializer, UserSerializer)
+                          BorrowRequestSerializer, BorrowRequestReadSerializer,
+                          UserRegistrationSerializer, UserSerializer)
 from .permissions import IsAdminOrStaff, IsAdmin, IsOwnerOrStaff
 
+IS_OVERDUE = Case(
+    When(status='overdue', then=Value(True)),
+    When(status='issued', borrow_until__lt=Now(), then=Value(True)),
+    default=Value(False),
+    output_field=BooleanField()
+)
+
+
+@lru_cache(maxsize=1024)
+def _parse_datetime(value):
+    """Parse an ISO 8601 date/datetime into an aware datetime, or None if invalid"""
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            parsed_date = parse_date(value)
+            if parsed_date is None:
+                return None
+            parsed = datetime.combine(parsed_date, time.min)
+    except ValueError:
+        return None
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+AVAILABILITY_CACHE_TIMEOUT = 30
+
+
+def _availability_version_key(equipment_id):
+    return f'avail-version:{equipment_id}'
+
+
+def invalidate_availability(equipment_id):
+    """Drop every cached availability period for the given equipment"""
+    cache.set(_availability_version_key(equipment_id), time_ns(), None)
+
 
 class UserViewSet(viewsets.GenericViewSet):
     serializer_class = UserSerializer
@@ -21,7 +67,16 @@ class UserViewSet(viewsets.GenericViewSet):
             user = serializer.save()
             return Response({
                 'message': 'User registered successfully',
-                'user': UserSerializer(user).data
+                'user': {
+                    'id': user.id,
+                    'username': user.username,
+                    'email': user.email,
+                    'first_name': user.first_name,
+                    'last_name': user.last_name,
+                    'role': user.role,
+                    'phone': user.phone,
+                    'department': user.department,
+                }
             }, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -44,6 +99,16 @@ class EquipmentCategoryViewSet(viewsets.ModelViewSet):
             return [IsAdmin()]
         return [IsAuthenticated()]
 
+    def get_queryset(self):
+        # Meta.ordering is not applied to GROUP BY queries, so order explicitly
+        return super().get_queryset().annotate(
+            equipment_count=Count('equipment')
+        ).order_by('name')
+
+    def perform_create(self, serializer):
+        category = serializer.save()
+        category.equipment_count = 0
+
 
 class EquipmentViewSet(viewsets.ModelViewSet):
     queryset = Equipment.objects.select_related('category').all()
@@ -79,23 +144,26 @@ class EquipmentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        try:
-            start_date = timezone.datetime.fromisoformat(start)
-            end_date = timezone.datetime.fromisoformat(end)
-        except ValueError:
+        start_date = _parse_datetime(start)
+        end_date = _parse_datetime(end)
+        if start_date is None or end_date is None:
             return Response(
                 {'error': 'Invalid date format'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        overlapping = BorrowRequest.objects.filter(
-            equipment=equipment,
-            status__in=['approved', 'issued'],
-            borrow_from__lt=end_date,
-            borrow_until__gt=start_date
-        )
+        def borrowed():
+            overlapping = BorrowRequest.objects.filter(
+                equipment=equipment,
+                status__in=ACTIVE_STATUSES,
+                borrow_from__lt=end_date,
+                borrow_until__gt=start_date
+            )
+            return overlapping.aggregate(total=Sum('quantity'))['total'] or 0
 
-        borrowed_quantity = sum(req.quantity for req in overlapping)
+        version = cache.get_or_set(_availability_version_key(equipment.id), 0, None)
+        key = f'avail:{equipment.id}:{version}:{start_date.isoformat()}:{end_date.isoformat()}'
+        borrowed_quantity = cache.get_or_set(key, borrowed, AVAILABILITY_CACHE_TIMEOUT)
         available = equipment.total_quantity - borrowed_quantity
 
         return Response({
@@ -105,6 +173,53 @@ class EquipmentViewSet(viewsets.ModelViewSet):
             'period': {'start': start, 'end': end}
         })
 
+    @action(detail=False, methods=['get'])
+    def bulk_availability(self, request):
+        start = request.query_params.get('start')
+        end = request.query_params.get('end')
+
+        if not start or not end:
+            return Response(
+                {'error': 'start and end parameters required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        start_date = _parse_datetime(start)
+        end_date = _parse_datetime(end)
+        if start_date is None or end_date is None:
+            return Response(
+                {'error': 'Invalid date format'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = self.get_queryset()
+        ids = request.query_params.get('ids')
+        if ids:
+            try:
+                queryset = queryset.filter(pk__in=[int(pk) for pk in ids.split(',')])
+            except ValueError:
+                return Response(
+                    {'error': 'ids must be a comma-separated list of integers'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        borrowed = BorrowRequest.objects.filter(
+            equipment=OuterRef('pk'),
+            status__in=ACTIVE_STATUSES,
+            borrow_from__lt=end_date,
+            borrow_until__gt=start_date
+        ).values('equipment').annotate(total=Sum('quantity')).values('total')
+
+        results = queryset.annotate(
+            borrowed=Coalesce(Subquery(borrowed), 0),
+            available_for_period=F('total_quantity') - F('borrowed')
+        ).values('id', 'total_quantity', 'available_for_period')
+
+        return Response({
+            'results': list(results),
+            'period': {'start': start, 'end': end}
+        })
+
 
 class BorrowRequestViewSet(viewsets.ModelViewSet):
     queryset = BorrowRequest.objects.select_related('user', 'equipment', 'approved_by').all()
@@ -116,27 +231,56 @@ class BorrowRequestViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().only(
+            'id', 'quantity', 'purpose', 'status', 'requested_date',
+            'borrow_from', 'borrow_until', 'approved_date', 'issued_date',
+            'returned_date', 'rejection_reason', 'notes',
+            'user', 'user__id', 'user__username', 'user__first_name', 'user__last_name',
+            'equipment', 'equipment__id', 'equipment__name',
+            'equipment__total_quantity', 'equipment__available_quantity',
+            'approved_by', 'approved_by__id', 'approved_by__first_name', 'approved_by__last_name',
+        ).annotate(is_overdue_sql=IS_OVERDUE)
 
         if user.role == 'student':
             queryset = queryset.filter(user=user)
 
         overdue = self.request.query_params.get('overdue', None)
         if overdue and overdue.lower() == 'true':
+            # Also match issued rows that mark_overdue has not transitioned yet
             queryset = queryset.filter(
-                status='issued',
-                borrow_until__lt=timezone.now()
+                Q(status='overdue') | Q(status='issued', borrow_until__lt=Now())
             )
 
         return queryset
 
+    def get_serializer_class(self):
+        if self.action in ['list', 'retrieve', 'approve', 'reject', 'issue', 'return_equipment']:
+            return BorrowRequestReadSerializer
+        return super().get_serializer_class()
+
     def get_permissions(self):
-        if self.action in ['approve', 'reject', 'issue', 'return']:
+        if self.action in ['approve', 'reject', 'issue', 'return_equipment']:
             return [IsAdminOrStaff()]
         if self.action in ['update', 'partial_update', 'destroy']:
             return [IsOwnerOrStaff()]
         return [IsAuthenticated()]
 
+    def _update_request(self, borrow_request, from_status=None, **changes):
+        """Write only the changed columns and mirror them on the loaded instance"""
+        queryset = BorrowRequest.objects.filter(pk=borrow_request.pk)
+        if isinstance(from_status, tuple):
+            queryset = queryset.filter(status__in=from_status)
+        elif from_status is not None:
+            queryset = queryset.filter(status=from_status)
+        updated = queryset.update(**changes)
+        if updated:
+            for field, value in changes.items():
+                setattr(borrow_request, field, value)
+            if 'status' in changes:
+                # Keep the queryset annotation in step with the new status
+                borrow_request.is_overdue_sql = borrow_request.is_overdue
+        return updated
+
     @action(detail=True, methods=['post'], permission_classes=[IsAdminOrStaff])
     def approve(self, request, pk=None):
         borrow_request = self.get_object()
@@ -147,16 +291,29 @@ class BorrowRequestViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if not borrow_request.check_availability():
-            return Response(
-                {'error': 'Equipment not available for requested period'},
-                status=status.HTTP_400_BAD_REQUEST
+        with transaction.atomic():
+            # Lock the equipment row so concurrent approvals for it are serialized
+            Equipment.objects.select_for_update().get(pk=borrow_request.equipment_id)
+
+            if not borrow_request.check_availability():
+                return Response(
+                    {'error': 'Equipment not available for requested period'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            updated = self._update_request(
+                borrow_request,
+                from_status='pending',
+                status='approved',
+                approved_by=request.user,
+                approved_date=timezone.now()
             )
-
-        borrow_request.status = 'approved'
-        borrow_request.approved_by = request.user
-        borrow_request.approved_date = timezone.now()
-        borrow_request.save()
+            if not updated:
+                return Response(
+                    {'error': 'Only pending requests can be approved'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        invalidate_availability(borrow_request.equipment_id)
 
         serializer = self.get_serializer(borrow_request)
         return Response(serializer.data)
@@ -172,11 +329,19 @@ class BorrowRequestViewSet(viewsets.ModelViewSet):
             )
 
         reason = request.data.get('reason', '')
-        borrow_request.status = 'rejected'
-        borrow_request.rejection_reason = reason
-        borrow_request.approved_by = request.user
-        borrow_request.approved_date = timezone.now()
-        borrow_request.save()
+        updated = self._update_request(
+            borrow_request,
+            from_status='pending',
+            status='rejected',
+            rejection_reason=reason,
+            approved_by=request.user,
+            approved_date=timezone.now()
+        )
+        if not updated:
+            return Response(
+                {'error': 'Only pending requests can be rejected'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         serializer = self.get_serializer(borrow_request)
         return Response(serializer.data)
@@ -191,19 +356,32 @@ class BorrowRequestViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        equipment = borrow_request.equipment
-        if equipment.available_quantity < borrow_request.quantity:
-            return Response(
-                {'error': 'Insufficient equipment quantity'},
-                status=status.HTTP_400_BAD_REQUEST
+        with transaction.atomic():
+            updated = self._update_request(
+                borrow_request,
+                from_status='approved',
+                status='issued',
+                issued_date=timezone.now()
             )
-
-        equipment.available_quantity -= borrow_request.quantity
-        equipment.save()
-
-        borrow_request.status = 'issued'
-        borrow_request.issued_date = timezone.now()
-        borrow_request.save()
+            if not updated:
+                return Response(
+                    {'error': 'Only approved requests can be issued'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            updated = Equipment.objects.filter(
+                pk=borrow_request.equipment_id,
+                available_quantity__gte=borrow_request.quantity
+            ).update(
+                available_quantity=F('available_quantity') - borrow_request.quantity,
+                updated_at=timezone.now()
+            )
+            if not updated:
+                transaction.set_rollback(True)
+                return Response(
+                    {'error': 'Insufficient equipment quantity'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
         serializer = self.get_serializer(borrow_request)
         return Response(serializer.data)
@@ -212,35 +390,108 @@ class BorrowRequestViewSet(viewsets.ModelViewSet):
     def return_equipment(self, request, pk=None):
         borrow_request = self.get_object()
 
-        if borrow_request.status not in ['issued', 'overdue']:
+        if borrow_request.status not in ('issued', 'overdue'):
             return Response(
                 {'error': 'Only issued requests can be returned'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        equipment = borrow_request.equipment
-        equipment.available_quantity += borrow_request.quantity
-        equipment.save()
-
-        borrow_request.status = 'returned'
-        borrow_request.returned_date = timezone.now()
-        notes = request.data.get('notes', '')
-        if notes:
-            borrow_request.notes = notes
-        borrow_request.save()
+        with transaction.atomic():
+            changes = {'status': 'returned', 'returned_date': timezone.now()}
+            notes = request.data.get('notes', '')
+            if notes:
+                changes['notes'] = notes
+            updated = self._update_request(
+                borrow_request, from_status=('issued', 'overdue'), **changes
+            )
+            if not updated:
+                return Response(
+                    {'error': 'Only issued requests can be returned'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            Equipment.objects.filter(pk=borrow_request.equipment_id).update(
+                available_quantity=Least(
+                    F('available_quantity') + borrow_request.quantity,
+                    F('total_quantity')
+                ),
+                updated_at=timezone.now()
+            )
+        invalidate_availability(borrow_request.equipment_id)
 
         serializer = self.get_serializer(borrow_request)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        serializer = BorrowRequestSerializer(data=request.data, many=True, allow_empty=False,
+                                             context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data
+
+        # One query for every active booking that could overlap any item in the batch
+        overlapping = BorrowRequest.objects.filter(
+            equipment__in={item['equipment'] for item in items},
+            status__in=ACTIVE_STATUSES,
+            borrow_from__lt=max(item['borrow_until'] for item in items),
+            borrow_until__gt=min(item['borrow_from'] for item in items)
+        ).values_list('equipment_id', 'borrow_from', 'borrow_until', 'quantity')
+        bookings = {}
+        for equipment_id, borrow_from, borrow_until, quantity in overlapping:
+            bookings.setdefault(equipment_id, []).append((borrow_from, borrow_until, quantity))
+
+        errors = []
+        for item in items:
+            borrowed_quantity = sum(
+                quantity for borrow_from, borrow_until, quantity
+                in bookings.get(item['equipment'].id, ())
+                if borrow_from < item['borrow_until'] and borrow_until > item['borrow_from']
+            )
+            available = item['equipment'].total_quantity - borrowed_quantity
+            errors.append({} if available >= item['quantity'] else {
+                'non_field_errors': ["Equipment not available for the requested period"]
+            })
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        borrow_requests = BorrowRequest.objects.bulk_create(
+            [BorrowRequest(user=request.user, **item) for item in items],
+            batch_size=500
+        )
+        data = BorrowRequestReadSerializer(borrow_requests, many=True).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    def _list_values(self, queryset):
+        """Read-only list rows built in SQL, keyed like BorrowRequestSerializer"""
+        return queryset.annotate(
+            user_name=Trim(Concat('user__first_name', Value(' '), 'user__last_name')),
+            equipment_name=F('equipment__name'),
+            approved_by_name=Case(
+                When(approved_by__isnull=True, then=Value(None)),
+                default=Trim(Concat('approved_by__first_name', Value(' '),
+                                    'approved_by__last_name')),
+                output_field=CharField()
+            )
+        ).values(
+            'id', 'user', 'user_name', 'equipment', 'equipment_name',
+            'quantity', 'purpose', 'status', 'requested_date',
+            'borrow_from', 'borrow_until', 'approved_by', 'approved_by_name',
+            'approved_date', 'issued_date', 'returned_date',
+            'rejection_reason', 'notes', is_overdue=F('is_overdue_sql')
+        )
+
+    def _list_response(self, queryset):
+        rows = self._list_values(queryset)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(list(rows))
+
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def my_requests(self, request):
-        requests = self.get_queryset().filter(user=request.user)
-        serializer = self.get_serializer(requests, many=True)
-        return Response(serializer.data)
+        return self._list_response(self.get_queryset().filter(user=request.user))
 
     @action(detail=False, methods=['get'], permission_classes=[IsAdminOrStaff])
     def pending(self, request):
-        requests = self.get_queryset().filter(status='pending')
-        serializer = self.get_serializer(requests, many=True)
-        return Response(serializer.data)
+        return self._list_response(self.get_queryset().filter(status='pending'))
 